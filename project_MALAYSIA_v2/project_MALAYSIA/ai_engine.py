@@ -4,16 +4,89 @@ Connects to local Ollama server for LLM inference
 """
 import requests
 import json
+import socket
+import threading
+import time
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlsplit
+from ollama_pool import EndpointPool
+from context_budget import ContextBudgeter, estimate_tokens
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because Ollama is marked unavailable"""
+    pass
+
+
+class RequestRejectedError(Exception):
+    """Raised when Ollama refuses the request itself (4xx), e.g. the model is not pulled on that endpoint"""
+    pass
+
+
+class StreamCancel:
+    """
+    Cancellation handle for a streamed Ollama call (same set()/is_set() API as threading.Event).
+    set() also shuts down the in-flight connection, so generation is aborted right away -
+    including while Ollama is still queueing/prefilling and has not sent a byte yet.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                # shutdown() wakes a thread blocked in recv(); close() alone does not
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, OSError):
+                pass
+            connection.close()
+
+    def attach(self, connection):
+        """Register the connected in-flight connection; False if already cancelled"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._connection = connection
+            return True
+
+    def detach(self):
+        with self._lock:
+            self._connection = None
+
 
 class AIEngine:
-    def __init__(self, model_name="llama3.1:latest"):
+    def __init__(self, model_name="llama3.1:latest", intent_model_name=None, endpoints=None, context_token_limit=2000,
+                 intent_latency_threshold=15.0, answer_latency_threshold=90.0, first_chunk_latency_threshold=20.0):
         """
-        Initialize with Ollama local model
+        Initialize with Ollama local model(s)
+        model_name: model used for answer generation (get_response)
+        intent_model_name: model used for classify_intent; a small fast model is recommended (defaults to model_name)
+        endpoints: list of Ollama base URLs to load-balance across (defaults to localhost)
+        context_token_limit: token budget for the whole prompt (system prompt, question, data, feedback, history)
+        *_latency_threshold: seconds after which a call counts as slow for the circuit breaker -
+            intent classification, whole non-streamed answers, and time to first chunk of streamed answers
         """
         self.model_name = model_name
-        self.base_url = "http://localhost:11434"
+        self.intent_model_name = intent_model_name or model_name
         self.chat_history = []
         
+        # Endpoint pool: model-aware least-outstanding balancing, one circuit breaker per endpoint
+        self.pool = EndpointPool(endpoints or ["http://localhost:11434"])
+        self.intent_latency_threshold = intent_latency_threshold
+        self.answer_latency_threshold = answer_latency_threshold
+        self.first_chunk_latency_threshold = first_chunk_latency_threshold
+        
+        # Prompt budget: compresses/dedupes feedback examples and trims history
+        self.budgeter = ContextBudgeter(max_tokens=context_token_limit)
+        
         # System prompt context
         self.system_prompt = """You are a helpful and friendly chatbot for UCSI University.
 You assist students and visitors with information about the university.
@@ -66,24 +139,157 @@ CRITICAL RULES FOR DATA PRIVACY:
 
         # Check if Ollama is running
         self._check_connection()
+        self.pool.start_probes()
     
     def _check_connection(self):
-        """Check if Ollama server is running"""
+        """Check if each Ollama server is running and record which configured models it has"""
+        required = {self.model_name, self.intent_model_name}
+        for endpoint in self.pool.endpoints:
+            try:
+                response = requests.get(f"{endpoint.url}/api/tags", timeout=5)
+                if response.status_code == 200:
+                    endpoint.update_models(response)
+                    print(f"Ollama connected ({endpoint.url}). Available models: {sorted(endpoint.models)}")
+                    missing = sorted(m for m in required if not endpoint.serves(m))
+                    if missing:
+                        print(f"Warning: {endpoint.url} is missing models: {missing} (not routed there)")
+                    continue
+            except requests.exceptions.ConnectionError:
+                print(f"Warning: Ollama server not running ({endpoint.url}).")
+            except Exception as e:
+                print(f"Warning: Could not connect to Ollama ({endpoint.url}): {e}")
+            # Start degraded; background probes will move the breaker to half-open on recovery
+            endpoint.breaker.trip("startup connection check failed")
+        
+        for model in sorted(required):
+            if not self.pool.serves(model):
+                print(f"Warning: no Ollama endpoint has model '{model}'. Run: ollama pull {model}")
+
+    def is_available(self):
+        """False while every endpoint serving the answer model is open (Ollama down or overloaded)"""
+        return self.pool.is_available(self.model_name)
+
+    def _acquire(self, model):
+        """Reserve the least-loaded healthy endpoint serving model, or raise CircuitOpenError"""
+        endpoint = self.pool.acquire(model)
+        if endpoint is None:
+            if not self.pool.serves(model):
+                raise CircuitOpenError(f"No Ollama endpoint has model '{model}'")
+            raise CircuitOpenError("All Ollama endpoints are unavailable")
+        return endpoint
+
+    def _on_rejected(self, endpoint, model, status_code):
+        """
+        A 4xx is a problem with the request, not with the endpoint's health:
+        don't count it against the breaker, and stop routing a missing model there.
+        """
+        endpoint.breaker.release_trial()
+        if status_code == 404:
+            self.pool.mark_missing(endpoint, model)
+        print(f"Ollama rejected request ({endpoint.url}, model '{model}'): status {status_code}")
+
+    def _post_chat(self, payload, timeout, latency_threshold):
+        """
+        POST to Ollama /api/chat on the least-loaded healthy endpoint serving the payload's model.
+        Raises CircuitOpenError without touching the network if no endpoint is available.
+        """
+        endpoint = self._acquire(payload["model"])
+        
+        start = time.monotonic()
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                model_names = [m["name"] for m in models]
-                print(f"Ollama connected. Available models: {model_names}")
-        except requests.exceptions.ConnectionError:
-            print("Warning: Ollama server not running.")
+            response = requests.post(f"{endpoint.url}/api/chat", json=payload, timeout=timeout)
         except Exception as e:
-            print(f"Warning: Could not connect to Ollama: {e}")
+            endpoint.breaker.record_failure(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self.pool.release(endpoint)
+        
+        if response.status_code == 200:
+            endpoint.breaker.record_success(time.monotonic() - start, latency_threshold)
+        elif 400 <= response.status_code < 500:
+            self._on_rejected(endpoint, payload["model"], response.status_code)
+        else:
+            endpoint.breaker.record_failure(f"status {response.status_code}")
+        return response
+
+    def _stream_chat(self, payload, timeout, cancel=None):
+        """
+        Streaming POST to Ollama /api/chat on the least-loaded healthy endpoint serving the payload's model.
+        Returns the full message, or None if cancel (a StreamCancel) was set before completion.
+        The endpoint slot is held for the whole stream.
+        Uses http.client rather than requests so the connection exists before Ollama
+        answers: Ollama only sends headers with the first token, and cancel.set()
+        must be able to abort the queue/prefill phase too.
+        """
+        if cancel is not None and cancel.is_set():
+            return None
+        endpoint = self._acquire(payload["model"])
+        
+        url = urlsplit(endpoint.url)
+        connection_class = HTTPSConnection if url.scheme == "https" else HTTPConnection
+        connection = connection_class(url.hostname, url.port, timeout=timeout)
+        start = time.monotonic()
+        first_chunk_latency = None
+        chunks = []
+        try:
+            connection.connect()
+            if cancel is not None and not cancel.attach(connection):
+                endpoint.breaker.release_trial()
+                return None
+            connection.request(
+                "POST", f"{url.path}/api/chat", body=json.dumps(payload),
+                headers={"Content-Type": "application/json"}
+            )
+            response = connection.getresponse()
+            if 400 <= response.status < 500:
+                self._on_rejected(endpoint, payload["model"], response.status)
+                raise RequestRejectedError(f"status {response.status}")
+            if response.status != 200:
+                raise RuntimeError(f"status {response.status}")
+            for line in iter(response.readline, b""):
+                line = line.strip()
+                if not line:
+                    continue
+                if first_chunk_latency is None:
+                    first_chunk_latency = time.monotonic() - start
+                chunk = json.loads(line)
+                chunks.append(chunk.get("message", {}).get("content", ""))
+                if chunk.get("done"):
+                    if "prompt_eval_count" in chunk:
+                        print(f"Prompt tokens (Ollama): {chunk['prompt_eval_count']}")
+                    break
+            else:
+                if not (cancel is not None and cancel.is_set()):
+                    raise RuntimeError("stream ended before the final chunk")
+        except RequestRejectedError:
+            raise
+        except Exception as e:
+            if cancel is None or not cancel.is_set():
+                endpoint.breaker.record_failure(f"{type(e).__name__}: {e}")
+                raise
+        finally:
+            if cancel is not None:
+                cancel.detach()
+            connection.close()
+            self.pool.release(endpoint)
+        
+        if cancel is not None and cancel.is_set():
+            # Not a completed call, so it can't prove recovery either way
+            endpoint.breaker.release_trial()
+            return None
+        
+        # Long answers are normal; only a slow start means the endpoint is overloaded
+        endpoint.breaker.record_success(
+            first_chunk_latency if first_chunk_latency is not None else time.monotonic() - start,
+            self.first_chunk_latency_threshold
+        )
+        return "".join(chunks)
 
     def classify_intent(self, user_message: str) -> dict:
         """
         Use LLM to classify the intent of the user's message.
         Returns a dict with 'intent' and optionally 'search_term'.
+        Raises CircuitOpenError if no Ollama endpoint is available.
         
         Simplified Intents:
         - GENERAL: Everything that doesn't require authentication (greetings, university info, statistics)
@@ -107,17 +313,13 @@ User message: """ + user_message
 
         try:
             payload = {
-                "model": self.model_name,
+                "model": self.intent_model_name,
                 "messages": [{"role": "user", "content": classification_prompt}],
                 "stream": False,
                 "format": "json"
             }
             
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json=payload,
-                timeout=30
-            )
+            response = self._post_chat(payload, timeout=30, latency_threshold=self.intent_latency_threshold)
             
             if response.status_code == 200:
                 result = response.json()
@@ -132,80 +334,104 @@ User message: """ + user_message
                         return {"intent": "PERSONAL_DATA", "search_term": None}
                     return {"intent": "GENERAL", "search_term": None}
             
+            print(f"Intent classification failed: Ollama returned status {response.status_code}")
             return {"intent": "GENERAL", "search_term": None}
             
+        except CircuitOpenError:
+            # Let the caller degrade instead of guessing GENERAL
+            raise
         except Exception as e:
             print(f"Intent classification error: {e}")
             return {"intent": "GENERAL", "search_term": None}
 
-    def get_response(self, user_message, data_context="", feedback_context=None):
-        """
-        Get a response from the local LLM
-        """
-        try:
-            # Build the prompt with context
-            prompt_parts = []
-            
-            if data_context:
-                prompt_parts.append(f"Context Data:\n{data_context}")
-            
-            # RLHF Lite: Add Feedback Context
-            if feedback_context:
-                if feedback_context.get('good'):
-                    good_list = "\n".join([f"- {item}" for item in feedback_context['good']])
-                    prompt_parts.append(f"""
+    def _build_messages(self, user_message, data_context="", feedback_context=None):
+        """Build the Ollama chat messages: system prompt, recent history and the context-enriched question"""
+        # Keep the whole prompt under the token budget
+        feedback_context, history, budget = self.budgeter.fit(
+            data_context, feedback_context, self.chat_history[-10:],  # Keep last 10 messages
+            fixed_tokens=estimate_tokens(self.system_prompt) + estimate_tokens(user_message)
+        )
+        
+        # Build the prompt with context
+        prompt_parts = []
+        
+        if data_context:
+            prompt_parts.append(f"Context Data:\n{data_context}")
+        
+        # RLHF Lite: Add Feedback Context
+        if feedback_context:
+            if feedback_context.get('good'):
+                good_list = "\n".join([f"- {self._indent_example(item)}" for item in feedback_context['good']])
+                prompt_parts.append(f"""
 Reference (Past Good Answers):
 The user previously liked these answers for a similar question. Use them as a style/content guide:
 {good_list}
 """)
-                
-                if feedback_context.get('bad'):
-                    bad_list = "\n".join([f"- {item}" for item in feedback_context['bad']])
-                    prompt_parts.append(f"""
+            
+            if feedback_context.get('bad'):
+                bad_list = "\n".join([f"- {self._indent_example(item)}" for item in feedback_context['bad']])
+                prompt_parts.append(f"""
 Constraint (Past Bad Answers):
 The user previously disliked these answers for a similar question. Do NOT repeat these mistakes:
 {bad_list}
 """)
 
-            prompt_parts.append(f"User Question: {user_message}")
-            
-            if data_context:
-                prompt_parts.append("Please answer based on the context data provided above. Be specific and use the data.")
-            elif feedback_context:
-                 prompt_parts.append("Please answer using the feedback references as a guide.")
-            
-            full_prompt = "\n\n".join(prompt_parts)
-            
-            # Prepare the request
+        prompt_parts.append(f"User Question: {user_message}")
+        
+        if data_context:
+            prompt_parts.append("Please answer based on the context data provided above. Be specific and use the data.")
+        elif feedback_context:
+            prompt_parts.append("Please answer using the feedback references as a guide.")
+        
+        full_prompt = "\n\n".join(prompt_parts)
+        
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            *history,
+            {"role": "user", "content": full_prompt}
+        ]
+        estimated = sum(estimate_tokens(m["content"]) for m in messages)
+        print(f"Prompt size: ~{estimated} tokens (budget {budget['total_tokens']}/{self.budgeter.max_tokens}: "
+              f"fixed {budget['fixed_tokens']}, data {budget['data_tokens']}, feedback {budget['feedback_tokens']}, history {budget['history_tokens']}; "
+              f"dropped {budget['dropped_examples']} examples, {budget['dropped_history']} history messages)")
+        return messages
+
+    @staticmethod
+    def _indent_example(example):
+        """Indent continuation lines so a multi-line example stays one list item"""
+        return str(example).replace("\n", "\n  ")
+
+    def get_response(self, user_message, data_context="", feedback_context=None):
+        """
+        Get a response from the local LLM
+        Raises CircuitOpenError if no Ollama endpoint is available.
+        """
+        try:
             payload = {
                 "model": self.model_name,
-                "messages": [
-                    {"role": "system", "content": self.system_prompt},
-                    *self.chat_history[-10:],  # Keep last 10 messages
-                    {"role": "user", "content": full_prompt}
-                ],
+                "messages": self._build_messages(user_message, data_context, feedback_context),
                 "stream": False
             }
             
             # Call Ollama API
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json=payload,
-                timeout=120
-            )
+            response = self._post_chat(payload, timeout=120, latency_threshold=self.answer_latency_threshold)
             
             if response.status_code == 200:
                 result = response.json()
                 assistant_message = result.get("message", {}).get("content", "")
+                if "prompt_eval_count" in result:
+                    print(f"Prompt tokens (Ollama): {result['prompt_eval_count']}")
                 
                 # Update chat history
-                self.chat_history.append({"role": "user", "content": user_message})
-                self.chat_history.append({"role": "assistant", "content": assistant_message})
+                self.remember(user_message, assistant_message)
                 
                 return assistant_message
             else:
                 return f"Error: Ollama returned status {response.status_code}"
                 
+        except CircuitOpenError:
+            # Let the caller degrade instead of showing an error string
+            raise
         except requests.exceptions.ConnectionError:
             return "Error: Cannot connect to Ollama. Make sure Ollama is running."
         except requests.exceptions.Timeout:
@@ -213,6 +439,29 @@ The user previously disliked these answers for a similar question. Do NOT repeat
         except Exception as e:
             return f"Error: {str(e)}"
 
+    def speculative_response(self, user_message, data_context="", feedback_context=None, cancel=None):
+        """
+        Generate an answer that may be thrown away (speculative execution).
+        Streams from Ollama so that cancel.set() (a StreamCancel) closes the connection
+        and stops generation, even before the first token. Does NOT touch chat history - call remember()
+        if the answer is used. Returns None if cancelled or on any error.
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": self._build_messages(user_message, data_context, feedback_context),
+            "stream": True
+        }
+        try:
+            return self._stream_chat(payload, timeout=120, cancel=cancel)
+        except Exception as e:
+            print(f"Speculative generation failed: {e}")
+            return None
+
+    def remember(self, user_message, assistant_message):
+        """Append a completed exchange to chat history"""
+        self.chat_history.append({"role": "user", "content": user_message})
+        self.chat_history.append({"role": "assistant", "content": assistant_message})
+
     def clear_history(self):
         """Clear chat history"""
         self.chat_history = []
@@ -2,12 +2,18 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
+import hmac
+import os
 
 # SECRET CONFIG (Should be in env)
 SECRET_KEY = "YOUR_SUPER_SECRET_KEY_FOR_JWT"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# API keys for registration desk / kiosk integrations (comma-separated, from env)
+# No keys configured = integration endpoints are closed
+INTEGRATION_API_KEYS = [k.strip() for k in os.getenv("INTEGRATION_API_KEYS", "").split(",") if k.strip()]
+
 def verify_password(plain_password, hashed_password):
     # bcrypt.checkpw requires bytes
     if isinstance(plain_password, str):
@@ -32,3 +38,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+def verify_integration_key(api_key: Optional[str]) -> bool:
+    if not api_key:
+        return False
+    # Constant-time compare on bytes (str compare_digest rejects non-ASCII)
+    api_key = api_key.encode('utf-8')
+    return any(hmac.compare_digest(api_key, key.encode('utf-8')) for key in INTEGRATION_API_KEYS)
@@ -0,0 +1,185 @@
+"""
+Circuit Breaker - Fast-fail protection for the Ollama client
+Trips on repeated failures or slow responses so requests degrade immediately
+instead of waiting out the HTTP timeouts while Ollama is down or overloaded.
+"""
+import threading
+import time
+
+import requests
+
+
+class CircuitBreaker:
+    CLOSED = "closed"        # Normal operation, calls go through
+    OPEN = "open"            # Ollama considered down, calls fail fast
+    HALF_OPEN = "half_open"  # Recovery trial, a single call is let through
+
+    def __init__(self, name="ollama", failure_threshold=3, latency_threshold=20.0,
+                 recovery_timeout=30.0, probe_interval=10.0):
+        """
+        name: label used in log messages (e.g. the endpoint URL)
+        failure_threshold: consecutive failures (or slow calls) before opening
+        latency_threshold: seconds after which a successful call counts as a failure
+        recovery_timeout: seconds to stay open before allowing a trial call
+        probe_interval: seconds between background health probes
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe_interval = probe_interval
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._opened_slow = False  # Opened by slow responses rather than unreachable calls
+        self._trial_in_flight = False
+        self._last_error = None
+        self._last_probe_ok = None
+        self._lock = threading.Lock()
+        self._probe_thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        """Move OPEN -> HALF_OPEN once the recovery timeout has passed (lock held)"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+    def _open(self, reason, slow=False):
+        """Trip the breaker (lock held)"""
+        if self._state != self.OPEN:
+            print(f"Circuit breaker OPEN ({self.name}): {reason}")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._opened_slow = slow
+        self._trial_in_flight = False
+        self._last_error = reason
+
+    def allow_request(self):
+        """
+        Return True if a call to Ollama may proceed.
+        In HALF_OPEN only one trial call is allowed at a time.
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def is_available(self):
+        """
+        False while OPEN, and while HALF_OPEN with the trial call already in
+        flight (allow_request() would refuse every other call in that window).
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.HALF_OPEN:
+                return not self._trial_in_flight
+            return self._state == self.CLOSED
+
+    def record_success(self, latency, latency_threshold=None):
+        """
+        Record a completed call; slow calls count towards opening.
+        latency_threshold overrides the default for this call type
+        (e.g. intent classification vs answer generation).
+        """
+        threshold = self.latency_threshold if latency_threshold is None else latency_threshold
+        with self._lock:
+            if latency > threshold:
+                self._count_failure(f"slow response ({latency:.1f}s > {threshold:.0f}s)", slow=True)
+                return
+            if self._state != self.CLOSED:
+                print(f"Circuit breaker CLOSED ({self.name}): Ollama recovered")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, reason="request failed"):
+        """Record a failed call"""
+        with self._lock:
+            self._count_failure(reason)
+
+    def _count_failure(self, reason, slow=False):
+        """Count a failure towards failure_threshold; a failed HALF_OPEN trial reopens (lock held)"""
+        self._last_error = reason
+        if self._state == self.HALF_OPEN:
+            self._open(f"trial call failed: {reason}", slow)
+            return
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._open(reason, slow)
+
+    def release_trial(self):
+        """Give back the HALF_OPEN trial slot without judging the endpoint (e.g. the call was cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def trip(self, reason):
+        """Force the breaker open, e.g. when the startup connection check fails"""
+        with self._lock:
+            self._open(reason)
+
+    def start_probes(self, health_url, on_response=None):
+        """
+        Start a daemon thread probing health_url (e.g. Ollama /api/tags).
+        on_response(response) is called with every successful probe response.
+        """
+        if self._probe_thread is not None:
+            return
+        self._probe_thread = threading.Thread(
+            target=self._probe_loop, args=(health_url, on_response), daemon=True
+        )
+        self._probe_thread.start()
+
+    def stop_probes(self):
+        self._stop_event.set()
+
+    def _probe_loop(self, health_url, on_response):
+        while not self._stop_event.wait(self.probe_interval):
+            try:
+                response = requests.get(health_url, timeout=min(5, self.probe_interval))
+                ok = response.status_code == 200
+                if ok and on_response is not None:
+                    on_response(response)
+            except Exception:
+                ok = False
+            self._on_probe(ok)
+
+    def _on_probe(self, ok):
+        """
+        Probes never close the breaker by themselves: a successful probe
+        while OPEN only skips the rest of the recovery timeout so the next
+        real call becomes the HALF_OPEN trial. That shortcut is only taken if
+        the breaker opened because Ollama was unreachable - /api/tags stays
+        fast while generation is overloaded, so a breaker opened by slow
+        responses waits out recovery_timeout. Failed probes count towards
+        failure_threshold like failed calls.
+        """
+        with self._lock:
+            self._last_probe_ok = ok
+            if ok and self._state == self.OPEN and not self._opened_slow:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            elif not ok and self._state != self.OPEN:
+                self._count_failure("health probe failed")
+
+    def status(self):
+        """Breaker snapshot for /api/health"""
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "last_error": self._last_error,
+                "last_probe_ok": self._last_probe_ok,
+            }
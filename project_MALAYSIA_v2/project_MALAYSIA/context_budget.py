@@ -0,0 +1,148 @@
+"""
+Context Budget - Keeps LLM prompts small
+Compresses RLHF-lite feedback examples (the long emoji-boxed templates),
+drops near-duplicates and fits the whole prompt (system prompt, question,
+data, feedback and history) under a token limit.
+"""
+import re
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+# Lines made only of template decoration (━━━━, ----, ====)
+DECORATION_LINE = re.compile(r"^[\s━─═\-=_*~·•]+$")
+# Leading emoji / symbols in front of a template line ("📋 Student Information")
+LEADING_SYMBOLS = re.compile(r"^[^\w\[\(\"']+", re.UNICODE)
+
+
+def estimate_tokens(text):
+    """
+    Rough token count without a tokenizer: ~4 ASCII characters per token,
+    and one token per non-ASCII character (emojis, box-drawing, Hangul).
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text so estimate_tokens(text) <= max_tokens, marking the cut with '…'"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4]
+    while cut and estimate_tokens(cut) + 1 > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    return cut.rstrip() + "…"
+
+
+class ContextBudgeter:
+    def __init__(self, max_tokens=2000, max_example_tokens=120, similarity_threshold=0.9, cache_size=512):
+        """
+        max_tokens: budget for the whole prompt - fixed parts (system prompt, question),
+            data context, feedback examples and chat history combined
+        max_example_tokens: cap for a single compressed feedback example
+        similarity_threshold: examples at least this similar (0-1) are treated as duplicates
+        cache_size: compressed examples kept in memory (one per feedback response)
+        """
+        self.max_tokens = max_tokens
+        self.max_example_tokens = max_example_tokens
+        self.similarity_threshold = similarity_threshold
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compress_example(self, text):
+        """
+        Summarize a past answer: drop template decoration and emojis but keep
+        one line per field (the layout the system prompt asks for), then truncate.
+        Cached per feedback response, so each feedback row is only compressed once.
+        """
+        with self._lock:
+            if text in self._cache:
+                self._cache.move_to_end(text)
+                return self._cache[text]
+
+        lines = []
+        for line in str(text).splitlines():
+            line = line.strip()
+            if not line or DECORATION_LINE.match(line):
+                continue
+            line = LEADING_SYMBOLS.sub("", line).strip()
+            if line:
+                lines.append(line)
+        summary = truncate_to_tokens("\n".join(lines), self.max_example_tokens)
+
+        with self._lock:
+            self._cache[text] = summary
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return summary
+
+    def dedupe(self, examples):
+        """Drop examples that are near-identical to one already kept (keeps order)"""
+        kept = []
+        for example in examples:
+            if not any(
+                SequenceMatcher(None, example, other).ratio() >= self.similarity_threshold
+                for other in kept
+            ):
+                kept.append(example)
+        return kept
+
+    def fit(self, data_context="", feedback_context=None, history=None, fixed_tokens=0):
+        """
+        Fit the prompt context into max_tokens.
+        fixed_tokens: parts that are always sent (system prompt, user question)
+        Priority: fixed parts and data context (never cut - the data is the answer's
+        source of truth), then good examples, then bad examples, then chat history
+        (most recent first). If the fixed parts and data alone exceed max_tokens a
+        warning is logged and no feedback or history is added.
+        Returns (feedback_context, history, report) where report holds token counts.
+        """
+        feedback_context = feedback_context or {}
+        history = history or []
+        remaining = self.max_tokens - fixed_tokens
+
+        data_tokens = estimate_tokens(data_context)
+        remaining -= data_tokens
+        if remaining < 0:
+            print(f"Warning: prompt over budget before feedback/history: fixed ~{fixed_tokens} + "
+                  f"data ~{data_tokens} tokens > limit {self.max_tokens}")
+
+        fitted_feedback = {}
+        feedback_tokens = 0
+        for kind in ("good", "bad"):
+            examples = self.dedupe([self.compress_example(e) for e in feedback_context.get(kind, [])])
+            fitted_feedback[kind] = []
+            for example in reversed(examples):  # Most recent feedback first
+                cost = estimate_tokens(example)
+                if cost > remaining:
+                    break
+                fitted_feedback[kind].insert(0, example)
+                remaining -= cost
+                feedback_tokens += cost
+
+        fitted_history = []
+        history_tokens = 0
+        for message in reversed(history):
+            cost = estimate_tokens(message.get("content", ""))
+            if cost > remaining:
+                break
+            fitted_history.insert(0, message)
+            remaining -= cost
+            history_tokens += cost
+        # Don't start the conversation with an orphaned assistant reply
+        if fitted_history and fitted_history[0].get("role") == "assistant":
+            history_tokens -= estimate_tokens(fitted_history.pop(0).get("content", ""))
+
+        report = {
+            "fixed_tokens": fixed_tokens,
+            "data_tokens": data_tokens,
+            "feedback_tokens": feedback_tokens,
+            "history_tokens": history_tokens,
+            "total_tokens": fixed_tokens + data_tokens + feedback_tokens + history_tokens,
+            "dropped_examples": sum(len(feedback_context.get(k, [])) - len(fitted_feedback[k]) for k in ("good", "bad")),
+            "dropped_history": len(history) - len(fitted_history),
+        }
+        return fitted_feedback, fitted_history, report
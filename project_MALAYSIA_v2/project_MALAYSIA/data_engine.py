@@ -13,6 +13,7 @@ class DataEngine:
         self.feedback_path = feedback_data_path
         self.df = None          # Student Data
         self.feedback_df = None # Feedback Data
+        self.roster = None      # Normalized (student number, name) keys for lookups
         self.load_data()
 
     def load_data(self):
@@ -28,6 +29,7 @@ class DataEngine:
         else:
             print(f"Student Data file not found: {self.student_path}")
             self.df = pd.DataFrame()
+        self._build_roster()
             
         # 2. Load Feedback Data (Read/Write)
         if os.path.exists(self.feedback_path):
@@ -52,17 +54,11 @@ class DataEngine:
             return []
         return self.df.columns.tolist()
 
-    def verify_student(self, student_number, name):
+    def _find_identity_columns(self):
         """
-        Verify a student exists with matching student number and name
-        Returns the student record if found, None otherwise
+        Find the student number and name columns.
+        Returns (student_num_col, name_col), or (None, None) if not found.
         """
-        if self.df is None or self.df.empty:
-            return None
-        
-        # Find columns that might be student number and name
-        cols = [c.lower() for c in self.df.columns]
-        
         # Try to find student number column
         student_num_col = None
         for col in self.df.columns:
@@ -89,14 +85,41 @@ class DataEngine:
                 student_num_col = self.df.columns[0]
                 name_col = self.df.columns[1]
             else:
-                return None
+                return None, None
+        
+        return student_num_col, name_col
+
+    def _build_roster(self):
+        """
+        Normalize the student number and name columns once at load time
+        (strip + lower), so lookups don't re-scan the whole table per call.
+        """
+        self.roster = None
+        if self.df is None or self.df.empty:
+            return
+        
+        student_num_col, name_col = self._find_identity_columns()
+        if not student_num_col:
+            return
         
         print(f"Using columns: StudentNum='{student_num_col}', Name='{name_col}'")
+        self.roster = pd.DataFrame({
+            "_num_key": self.df[student_num_col].astype(str).str.strip().str.lower(),
+            "_name_key": self.df[name_col].astype(str).str.strip().str.lower(),
+        }, index=self.df.index)
+
+    def verify_student(self, student_number, name):
+        """
+        Verify a student exists with matching student number and name
+        Returns the student record if found, None otherwise
+        """
+        if self.roster is None:
+            return None
         
         # Search for matching student
         mask = (
-            (self.df[student_num_col].astype(str).str.strip().str.lower() == str(student_number).strip().lower()) &
-            (self.df[name_col].astype(str).str.strip().str.lower() == str(name).strip().lower())
+            (self.roster["_num_key"] == str(student_number).strip().lower()) &
+            (self.roster["_name_key"] == str(name).strip().lower())
         )
         
         matches = self.df[mask]
@@ -108,6 +131,53 @@ class DataEngine:
         
         return None
 
+    def verify_students_bulk(self, students):
+        """
+        Verify many students in one pass (vectorized join against the normalized roster)
+        students: list of dicts with 'student_number' and 'name'
+        Returns one dict per input row, in input order:
+        {"row", "student_number", "name", "matched", "student_data" (record or None)}
+        """
+        requests_df = pd.DataFrame({
+            "student_number": [str(s.get("student_number", "")) for s in students],
+            "name": [str(s.get("name", "")) for s in students],
+        })
+        if requests_df.empty:
+            return []
+        
+        requests_df["_num_key"] = requests_df["student_number"].str.strip().str.lower()
+        requests_df["_name_key"] = requests_df["name"].str.strip().str.lower()
+        requests_df["_pos"] = None
+        
+        if self.roster is not None:
+            # First match wins, same as verify_student
+            roster = self.roster.assign(_pos=range(len(self.roster))).drop_duplicates(
+                subset=["_num_key", "_name_key"], keep="first"
+            )
+            requests_df = requests_df.drop(columns="_pos").merge(
+                roster, on=["_num_key", "_name_key"], how="left"
+            )
+        
+        matched = requests_df["_pos"].notna()
+        records = {}
+        if matched.any():
+            positions = requests_df.loc[matched, "_pos"].astype(int).unique()
+            records = dict(zip(positions, self.df.iloc[positions].to_dict(orient="records")))
+        
+        results = []
+        for i, (number, name, pos) in enumerate(zip(
+            requests_df["student_number"], requests_df["name"], requests_df["_pos"]
+        )):
+            is_match = pd.notna(pos)
+            results.append({
+                "row": i,
+                "student_number": number,
+                "name": name,
+                "matched": bool(is_match),
+                "student_data": records.get(int(pos)) if is_match else None
+            })
+        return results
+
     def get_student_info(self, student_number):
         """Get a specific student's information by student number"""
         if self.df is None or self.df.empty:
@@ -0,0 +1,164 @@
+"""
+Data Executor - Runs blocking DataEngine work off the event loop
+pandas scans and Excel writes run in bounded worker pools. The student roster
+is read-only and needs no lock; the feedback data is guarded by a
+readers-writer lock so lookups run concurrently while feedback saves are exclusive.
+Feedback work has its own pool, so threads blocked on that lock never hold up
+roster operations.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorBusyError(Exception):
+    """Raised when the pool already has max_pending operations queued or running"""
+    pass
+
+
+class ReadWriteLock:
+    """
+    Many readers or one writer. Writers are preferred: once a writer is
+    waiting, new readers queue behind it so feedback saves cannot starve.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class DataExecutor:
+    def __init__(self, data_engine, max_workers=4, feedback_workers=2, max_pending=64):
+        """
+        data_engine: the shared DataEngine instance
+        max_workers: worker threads running roster operations
+        feedback_workers: worker threads running feedback reads/writes (these may wait on feedback_lock)
+        max_pending: queued + running operations (both pools) before new ones are rejected
+        """
+        self.data_engine = data_engine
+        self.max_workers = max_workers
+        self.feedback_workers = feedback_workers
+        self.max_pending = max_pending
+        self.feedback_lock = ReadWriteLock()  # Guards DataEngine.feedback_df
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="data-worker")
+        self._feedback_pool = ThreadPoolExecutor(max_workers=feedback_workers, thread_name_prefix="feedback-worker")
+
+        # Saturation metrics (guarded by _stats_lock)
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self._peak_pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    async def run(self, method_name, *args, **kwargs):
+        """Run a DataEngine method on the read-only student roster (no lock)"""
+        return await self._submit(method_name, args, kwargs, lock_mode=None)
+
+    async def read(self, method_name, *args, **kwargs):
+        """Run a DataEngine method that reads feedback data, under the shared lock"""
+        return await self._submit(method_name, args, kwargs, lock_mode="read")
+
+    async def write(self, method_name, *args, **kwargs):
+        """Run a DataEngine method that modifies feedback data, under the exclusive lock"""
+        return await self._submit(method_name, args, kwargs, lock_mode="write")
+
+    async def _submit(self, method_name, args, kwargs, lock_mode):
+        with self._stats_lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorBusyError(f"Data executor saturated ({self._pending} pending)")
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+
+        method = getattr(self.data_engine, method_name)
+        pool = self._pool if lock_mode is None else self._feedback_pool
+        submitted = time.monotonic()
+        try:
+            future = pool.submit(self._run, method, args, kwargs, lock_mode, submitted)
+        except Exception:
+            self._release_slot()
+            raise
+        # The slot is freed when the job itself finishes (or is dropped from the
+        # queue), not when the awaiting request is cancelled
+        future.add_done_callback(lambda _: self._release_slot())
+        return await asyncio.wrap_future(future)
+
+    def _release_slot(self):
+        with self._stats_lock:
+            self._pending -= 1
+
+    def _run(self, method, args, kwargs, lock_mode, submitted):
+        """Executed on a worker thread"""
+        if lock_mode == "write":
+            acquire, release = self.feedback_lock.acquire_write, self.feedback_lock.release_write
+        elif lock_mode == "read":
+            acquire, release = self.feedback_lock.acquire_read, self.feedback_lock.release_read
+        else:
+            acquire = release = lambda: None
+        acquire()
+        started = time.monotonic()
+        with self._stats_lock:
+            self._active += 1
+            self._total_wait += started - submitted
+        try:
+            return method(*args, **kwargs)
+        finally:
+            release()
+            with self._stats_lock:
+                self._active -= 1
+                self._completed += 1
+                self._total_run += time.monotonic() - started
+
+    def metrics(self):
+        """Pool saturation snapshot for /api/metrics"""
+        with self._stats_lock:
+            completed = self._completed or 1
+            return {
+                "max_workers": self.max_workers,
+                "feedback_workers": self.feedback_workers,
+                "max_pending": self.max_pending,
+                "active": self._active,
+                "pending": self._pending,
+                "queued": max(self._pending - self._active, 0),
+                "peak_pending": self._peak_pending,
+                "saturation": round(self._pending / self.max_pending, 3),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._total_wait / completed * 1000, 2),
+                "avg_run_ms": round(self._total_run / completed * 1000, 2),
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+        self._feedback_pool.shutdown(wait=True)
@@ -6,17 +6,27 @@ Features:
 - RAG (Retrieval-Augmented Generation) for data queries
 - Intent detection by AI
 """
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
 from data_engine import DataEngine
-from ai_engine import AIEngine
+from data_executor import DataExecutor, ExecutorBusyError
+from ai_engine import AIEngine, CircuitOpenError, StreamCancel
+from auth_utils import verify_integration_key
 import uvicorn
+import asyncio
 import os
 import re
+import csv
+import io
+import json
+import uuid
+import time
 import logging
+from collections import OrderedDict
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
@@ -34,12 +44,28 @@ def anonymize_log(data: str) -> str:
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     body = await request.body()
-    decoded_body = body.decode("utf-8") if body else ""
+    decoded_body = body.decode("utf-8", errors="replace") if body else ""
     safe_body = anonymize_log(decoded_body)
     logger.info(f"Request: {request.method} {request.url.path}")
     response = await call_next(request)
     return response
 
+# Bulk upload size guard - runs before log_requests, so oversized bodies are never read
+@app.middleware("http")
+async def limit_bulk_upload(request: Request, call_next):
+    if request.url.path.startswith("/api/verify/bulk"):
+        length = request.headers.get("content-length")
+        if length is None or not length.isdigit():
+            return JSONResponse(status_code=411, content={"detail": "Content-Length header is required"})
+        if int(length) > MAX_BULK_BYTES:
+            return JSONResponse(status_code=413, content={"detail": f"Upload too large (max {MAX_BULK_BYTES} bytes)"})
+    return await call_next(request)
+
+@app.exception_handler(ExecutorBusyError)
+async def executor_busy_handler(request: Request, exc: ExecutorBusyError):
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Server is busy. Please try again shortly."})
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -53,12 +79,56 @@ app.add_middleware(
 DATA_FILE = "Chatbot_TestData.xlsx"
 data_engine = DataEngine(DATA_FILE)
 
-MODEL_NAME = "llama3.1:latest"
-ai_engine = AIEngine(MODEL_NAME)
+# Blocking pandas/Excel work runs on these bounded pools, never on the event loop
+DATA_WORKERS = int(os.getenv("DATA_WORKERS", "4"))
+FEEDBACK_WORKERS = int(os.getenv("FEEDBACK_WORKERS", "2"))
+data_executor = DataExecutor(data_engine, max_workers=DATA_WORKERS, feedback_workers=FEEDBACK_WORKERS)
+
+# Model routing: a small fast model can handle intent classification,
+# the larger one generates answers. Add endpoints to scale out inference.
+MODEL_NAME = os.getenv("OLLAMA_MODEL", "llama3.1:latest")
+INTENT_MODEL_NAME = os.getenv("OLLAMA_INTENT_MODEL", MODEL_NAME)
+OLLAMA_ENDPOINTS = [url.strip() for url in os.getenv("OLLAMA_ENDPOINTS", "http://localhost:11434").split(",") if url.strip()]
+CONTEXT_TOKEN_LIMIT = int(os.getenv("CONTEXT_TOKEN_LIMIT", "2000"))
+# Seconds after which a call counts as slow for the circuit breaker (per call type)
+INTENT_LATENCY_THRESHOLD = float(os.getenv("INTENT_LATENCY_THRESHOLD", "15"))
+ANSWER_LATENCY_THRESHOLD = float(os.getenv("ANSWER_LATENCY_THRESHOLD", "90"))
+FIRST_CHUNK_LATENCY_THRESHOLD = float(os.getenv("FIRST_CHUNK_LATENCY_THRESHOLD", "20"))
+ai_engine = AIEngine(
+    MODEL_NAME,
+    intent_model_name=INTENT_MODEL_NAME,
+    endpoints=OLLAMA_ENDPOINTS,
+    context_token_limit=CONTEXT_TOKEN_LIMIT,
+    intent_latency_threshold=INTENT_LATENCY_THRESHOLD,
+    answer_latency_threshold=ANSWER_LATENCY_THRESHOLD,
+    first_chunk_latency_threshold=FIRST_CHUNK_LATENCY_THRESHOLD
+)
+
+# Speculative execution (opt-in): generate the GENERAL answer while intent is being classified
+SPECULATIVE_MODE = os.getenv("SPECULATIVE_MODE", "0").lower() in ("1", "true", "yes")
 
 # In-memory session storage (for demo - use Redis/DB in production)
 verified_sessions = {}
 
+# Largest batch accepted by the bulk verify endpoints (rows, and request body bytes)
+MAX_BULK_VERIFY = int(os.getenv("MAX_BULK_VERIFY", "5000"))
+MAX_BULK_BYTES = int(os.getenv("MAX_BULK_BYTES", str(MAX_BULK_VERIFY * 200)))
+
+# Sessions created by the bulk endpoints expire, and only the newest MAX_BULK_SESSIONS are kept
+BULK_SESSION_TTL = int(os.getenv("BULK_SESSION_TTL", "3600"))
+MAX_BULK_SESSIONS = int(os.getenv("MAX_BULK_SESSIONS", "10000"))
+bulk_session_expiry = OrderedDict()  # session_id -> expiry (time.monotonic), oldest first
+
+def prune_bulk_sessions(incoming=0):
+    """Remove expired bulk sessions, then the oldest ones until `incoming` new ones fit under the cap"""
+    now = time.monotonic()
+    while bulk_session_expiry:
+        session_id, expires_at = next(iter(bulk_session_expiry.items()))
+        if expires_at > now and len(bulk_session_expiry) + incoming <= MAX_BULK_SESSIONS:
+            break
+        bulk_session_expiry.popitem(last=False)
+        verified_sessions.pop(session_id, None)
+
 # Request Models
 class ChatRequest(BaseModel):
     message: str
@@ -69,6 +139,10 @@ class VerifyRequest(BaseModel):
     name: str
     session_id: str
 
+class BulkVerifyItem(BaseModel):
+    student_number: str
+    name: str
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -81,6 +155,92 @@ class FeedbackRequest(BaseModel):
 # Intent classification is now handled by AIEngine.classify_intent()
 # No more hardcoded pattern matching!
 
+STATS_KEYWORDS = ["how many", "total student", "gender", "ratio", "nationality", "statistics", "student count"]
+LOGIN_HINT = "🔒 This is student personal information. To view details, please login using the Login button above."
+
+def format_stats(stats: dict) -> str:
+    """Render get_summary_stats() in the chatbot's statistics template (no LLM needed)"""
+    if "error" in stats:
+        return f"📊 University Statistics\n{stats['error']}"
+    
+    total = stats.get("total_students", 0)
+    lines = ["📊 University Statistics", "━━━━━━━━━━━━━━━━━━━━━━━━", f"Total Students: {total}"]
+    
+    if stats.get("gender_breakdown"):
+        lines += ["", "👥 Gender Distribution:"]
+        for gender, count in stats["gender_breakdown"].items():
+            percentage = round(count / total * 100, 1) if total else 0
+            lines.append(f"   {gender}: {count} ({percentage}%)")
+    
+    if stats.get("nationality_breakdown"):
+        lines += ["", "🌍 Top Nationalities:"]
+        top = sorted(stats["nationality_breakdown"].items(), key=lambda kv: kv[1], reverse=True)[:5]
+        for rank, (country, count) in enumerate(top, 1):
+            lines.append(f"   {rank}. {country}: {count}")
+    
+    lines.append("━━━━━━━━━━━━━━━━━━━━━━━━")
+    return "\n".join(lines)
+
+async def general_context(user_message: str) -> str:
+    """Context for GENERAL intent: university statistics when asked for, otherwise none"""
+    message_lower = user_message.lower()
+    if any(kw in message_lower for kw in STATS_KEYWORDS):
+        stats = await data_executor.run("get_summary_stats")
+        return f"UNIVERSITY STATISTICS:\n{stats}"
+    return ""
+
+class SpeculativeAnswer:
+    """
+    GENERAL answer generated in parallel with intent classification.
+    Uses the same context and feedback as the normal GENERAL path, so the
+    answer can be returned as-is if the intent turns out to be GENERAL.
+    """
+
+    def __init__(self, user_message: str, feedback_task: asyncio.Task):
+        self.cancel_handle = StreamCancel()
+        self.task = asyncio.create_task(self._generate(user_message, feedback_task))
+        # Swallow errors of abandoned speculations ("Task exception was never retrieved")
+        self.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _generate(self, user_message, feedback_task):
+        context = await general_context(user_message)
+        # Shielded: cancelling the speculation must not cancel the retrieval chat() still awaits
+        feedback_context = await asyncio.shield(feedback_task)
+        return await asyncio.to_thread(
+            ai_engine.speculative_response, user_message, context, feedback_context, self.cancel_handle
+        )
+
+    def cancel(self):
+        """Abort generation (closes the Ollama connection); nothing from it is ever returned to the user"""
+        self.cancel_handle.set()
+        self.task.cancel()
+
+    async def result(self):
+        """The speculative answer, or None if it failed (caller falls back to a normal call)"""
+        try:
+            return await self.task
+        except Exception as e:
+            logger.warning(f"Speculative answer discarded: {e}")
+            return None
+
+async def degraded_response(user_message: str, verified_student: dict = None) -> dict:
+    """
+    Immediate answer used while every Ollama endpoint's circuit breaker is open.
+    Statistics questions are answered from the data directly; everything else
+    gets the login hint (guests) or a short unavailable notice.
+    """
+    message_lower = user_message.lower()
+    user = verified_student["name"] if verified_student else "guest"
+    
+    if any(kw in message_lower for kw in STATS_KEYWORDS):
+        response = format_stats(await data_executor.run("get_summary_stats"))
+    elif not verified_student:
+        response = "⚠️ The AI assistant is temporarily unavailable.\n\n" + LOGIN_HINT
+    else:
+        response = "⚠️ The AI assistant is temporarily unavailable. Please try again in a moment."
+    
+    return {"response": response, "user": user, "type": "degraded"}
+
 # Endpoints
 
 @app.get("/")
@@ -89,12 +249,23 @@ def home():
 
 @app.get("/api/health")
 def health():
-    return {"status": "healthy", "model": MODEL_NAME}
+    pool = ai_engine.pool.status()
+    return {
+        "status": "healthy" if pool["state"] == "closed" else "degraded",
+        "model": MODEL_NAME,
+        "intent_model": INTENT_MODEL_NAME,
+        "ollama_circuit": pool
+    }
+
+@app.get("/api/metrics")
+def metrics():
+    """Worker pool saturation metrics"""
+    return {"data_executor": data_executor.metrics()}
 
 @app.get("/api/stats")
-def stats():
+async def stats():
     """Public endpoint - general statistics only"""
-    return data_engine.get_summary_stats()
+    return await data_executor.run("get_summary_stats")
 
 @app.post("/api/verify")
 async def verify_student(request: VerifyRequest):
@@ -102,7 +273,7 @@ async def verify_student(request: VerifyRequest):
     Verify a student by student number and name
     Returns success if the student exists in the database
     """
-    student = data_engine.verify_student(request.student_number, request.name)
+    student = await data_executor.run("verify_student", request.student_number, request.name)
     
     if student:
         # Store verified session
@@ -122,6 +293,90 @@ async def verify_student(request: VerifyRequest):
             "message": "Student not found. Please check your student number and name."
         }
 
+async def require_integration_key(x_api_key: Optional[str] = Header(None)):
+    """Bulk endpoints are for registration desk / kiosk integrations only"""
+    if not verify_integration_key(x_api_key):
+        raise HTTPException(status_code=401, detail="A valid X-API-Key header is required")
+
+async def bulk_verify(students: List[dict], create_sessions: bool) -> StreamingResponse:
+    """
+    Resolve a whole batch with one vectorized join, then stream NDJSON
+    (one line per input row, in input order).
+    If create_sessions is set, each matched student gets one verified session
+    (duplicate rows share it) with a server-generated session_id, valid for
+    BULK_SESSION_TTL seconds. Sessions are all created before streaming
+    starts, so a client disconnect can't leave the batch half done.
+    """
+    if len(students) > MAX_BULK_VERIFY:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BULK_VERIFY} rows)")
+    
+    results = await data_executor.run("verify_students_bulk", students)
+    logger.info(f"Bulk verify: {sum(r['matched'] for r in results)}/{len(results)} matched")
+    
+    batch_sessions = {}  # (student_number, name) normalized like the roster -> session_id
+    if create_sessions:
+        matched_students = {
+            (r["student_number"].strip().lower(), r["name"].strip().lower()) for r in results if r["matched"]
+        }
+        prune_bulk_sessions(incoming=len(matched_students))
+    expires_at = time.monotonic() + BULK_SESSION_TTL
+    
+    for result in results:
+        student_data = result.pop("student_data")
+        if create_sessions and result["matched"]:
+            key = (result["student_number"].strip().lower(), result["name"].strip().lower())
+            if key not in batch_sessions:
+                session_id = uuid.uuid4().hex
+                verified_sessions[session_id] = {
+                    "student_number": result["student_number"],
+                    "name": result["name"],
+                    "student_data": student_data
+                }
+                bulk_session_expiry[session_id] = expires_at
+                batch_sessions[key] = session_id
+            result["session_id"] = batch_sessions[key]
+    
+    def lines():
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/api/verify/bulk", dependencies=[Depends(require_integration_key)])
+async def verify_students_bulk(students: List[BulkVerifyItem], create_sessions: bool = False):
+    """
+    Verify a JSON array of {student_number, name} in one pass (requires X-API-Key)
+    Streams one JSON result per line: {row, student_number, name, matched[, session_id]}
+    """
+    return await bulk_verify([s.model_dump() for s in students], create_sessions)
+
+@app.post("/api/verify/bulk/csv", dependencies=[Depends(require_integration_key)])
+async def verify_students_bulk_csv(file: UploadFile = File(...), create_sessions: bool = False):
+    """
+    Same as /api/verify/bulk, from an uploaded UTF-8 CSV with header
+    student_number,name (other columns are ignored)
+    """
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+        reader = csv.DictReader(io.StringIO(content))
+        fields = {(f or "").strip().lower() for f in (reader.fieldnames or [])}
+        if not {"student_number", "name"} <= fields:
+            raise HTTPException(status_code=400, detail="CSV must have 'student_number' and 'name' columns")
+        
+        students = []
+        for row in reader:
+            row = {(k or "").strip().lower(): v for k, v in row.items() if k is not None}
+            students.append({
+                "student_number": (row.get("student_number") or "").strip(),
+                "name": (row.get("name") or "").strip()
+            })
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded")
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    
+    return await bulk_verify(students, create_sessions)
+
 @app.post("/api/chat")
 async def chat(request: ChatRequest):
     """
@@ -136,16 +391,41 @@ async def chat(request: ChatRequest):
     session_id = request.session_id
     context = ""
     
-    # Check if user is verified
+    # Check if user is verified (expired bulk sessions are dropped first)
+    prune_bulk_sessions()
     verified_student = verified_sessions.get(session_id) if session_id else None
     
-    # Use AI to classify intent
-    intent_result = ai_engine.classify_intent(user_message)
+    # Fail fast while Ollama is down or overloaded
+    if not ai_engine.is_available():
+        return await degraded_response(user_message, verified_student)
+    
+    # Check for past feedback (RLHF Lite) - runs concurrently with classification
+    feedback_task = asyncio.create_task(data_executor.read("get_relevant_feedback", user_message))
+    
+    # Speculative mode: start the GENERAL answer now instead of after classification
+    speculation = SpeculativeAnswer(user_message, feedback_task) if SPECULATIVE_MODE else None
+    
+    # Use AI to classify intent (off the event loop)
+    try:
+        intent_result = await asyncio.to_thread(ai_engine.classify_intent, user_message)
+    except CircuitOpenError:
+        intent_result = None
+    
+    # Breaker may have tripped before/during classification - don't wait on the answer call
+    if intent_result is None or not ai_engine.is_available():
+        if speculation:
+            speculation.cancel()
+        feedback_task.cancel()
+        return await degraded_response(user_message, verified_student)
+    
     intent = intent_result.get("intent", "GENERAL")
     search_term = intent_result.get("search_term")
     
-    # Check for past feedback (RLHF Lite)
-    feedback_context = data_engine.get_relevant_feedback(user_message)
+    # Only a GENERAL answer may be emitted - cancel before anything else can happen
+    if speculation and intent != "GENERAL":
+        speculation.cancel()
+    
+    feedback_context = await feedback_task
     if feedback_context['good'] or feedback_context['bad']:
         logger.info(f"Found feedback context: {len(feedback_context['good'])} good, {len(feedback_context['bad'])} bad")
     
@@ -160,7 +440,7 @@ async def chat(request: ChatRequest):
         if not verified_student:
             # Friendly message instead of forcing login
             return {
-                "response": "🔒 This is student personal information. To view details, please login using the Login button above.",
+                "response": LOGIN_HINT,
                 "type": "login_hint",
                 "user": "guest"
             }
@@ -198,15 +478,27 @@ async def chat(request: ChatRequest):
     # ===========================================
     
     elif intent == "GENERAL":
-        # Check if asking for statistics
-        message_lower = user_message.lower()
-        if any(kw in message_lower for kw in ["how many", "total student", "gender", "ratio", "nationality", "statistics", "student count"]):
-            stats = data_engine.get_summary_stats()
-            context = f"UNIVERSITY STATISTICS:\n{stats}"
-        # Otherwise, just general conversation - no special context
+        # Speculative answer was built with exactly this context - use it if it succeeded
+        if speculation:
+            response = await speculation.result()
+            if response is not None:
+                ai_engine.remember(user_message, response)
+                return {
+                    "response": response,
+                    "user": verified_student["name"] if verified_student else "guest",
+                    "type": "message"
+                }
+        
+        # Statistics context if asked for, otherwise just general conversation
+        context = await general_context(user_message)
     
-    # Generate response
-    response = ai_engine.get_response(user_message, data_context=context, feedback_context=feedback_context)
+    # Generate response (off the event loop)
+    try:
+        response = await asyncio.to_thread(
+            ai_engine.get_response, user_message, data_context=context, feedback_context=feedback_context
+        )
+    except CircuitOpenError:
+        return await degraded_response(user_message, verified_student)
     
     return {
         "response": response,
@@ -225,7 +517,7 @@ async def logout(request: dict):
 @app.post("/api/feedback")
 async def save_feedback(request: FeedbackRequest):
     """Save user feedback for RLHF"""
-    success = data_engine.save_feedback(request.query, request.response, request.score)
+    success = await data_executor.write("save_feedback", request.query, request.response, request.score)
     return {"success": success}
 
 # Mount Static Files
@@ -0,0 +1,111 @@
+"""
+Ollama Endpoint Pool - Load balancing across local inference boxes
+Each endpoint has its own circuit breaker and model list; requests go to the
+healthy endpoint serving the requested model with the fewest outstanding
+requests (round-robin between ties).
+"""
+import threading
+
+from circuit_breaker import CircuitBreaker
+
+
+class OllamaEndpoint:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.breaker = CircuitBreaker(name=self.url)
+        self.outstanding = 0    # In-flight requests (guarded by the pool lock)
+        self.total_requests = 0
+        self.models = None      # Model names from /api/tags; None until the endpoint has answered once
+
+    def update_models(self, response):
+        """Refresh the model list from an /api/tags response"""
+        try:
+            self.models = {m["name"] for m in response.json().get("models", [])}
+        except Exception:
+            pass
+
+    def serves(self, model):
+        """True if the endpoint has the model (or its model list is not known yet)"""
+        if model is None or self.models is None:
+            return True
+        # Ollama lists untagged pulls as "<name>:latest"
+        return model in self.models or f"{model}:latest" in self.models
+
+    def status(self):
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "total_requests": self.total_requests,
+            "models": sorted(self.models) if self.models is not None else None,
+            **self.breaker.status()
+        }
+
+
+class EndpointPool:
+    def __init__(self, urls):
+        """
+        urls: list of Ollama base URLs, e.g. ["http://localhost:11434", "http://gpu-box:11434"]
+        """
+        if not urls:
+            raise ValueError("EndpointPool needs at least one Ollama URL")
+        self.endpoints = [OllamaEndpoint(url) for url in urls]
+        self._lock = threading.Lock()
+        self._next = 0  # Round-robin start index for breaking outstanding-count ties
+
+    def start_probes(self):
+        """Start background /api/tags health probes for every endpoint (they also refresh model lists)"""
+        for endpoint in self.endpoints:
+            endpoint.breaker.start_probes(f"{endpoint.url}/api/tags", on_response=endpoint.update_models)
+
+    def serves(self, model):
+        """True if at least one endpoint has the model"""
+        return any(e.serves(model) for e in self.endpoints)
+
+    def acquire(self, model=None):
+        """
+        Pick the healthy endpoint serving model with the least outstanding
+        requests and reserve a slot on it. Returns None if no such endpoint
+        will accept a call right now.
+        """
+        with self._lock:
+            # Rotate the starting point so ties (e.g. all idle) alternate endpoints
+            order = self.endpoints[self._next:] + self.endpoints[:self._next]
+            candidates = sorted(order, key=lambda e: e.outstanding)  # Stable: keeps the rotation for ties
+            for endpoint in candidates:
+                if endpoint.serves(model) and endpoint.breaker.allow_request():
+                    endpoint.outstanding += 1
+                    endpoint.total_requests += 1
+                    self._next = (self.endpoints.index(endpoint) + 1) % len(self.endpoints)
+                    return endpoint
+        return None
+
+    def release(self, endpoint):
+        """Free the slot reserved by acquire()"""
+        with self._lock:
+            endpoint.outstanding -= 1
+
+    def mark_missing(self, endpoint, model):
+        """Stop routing model to endpoint after it answered 404 (the next probe re-adds it if pulled)"""
+        with self._lock:
+            if endpoint.models is not None:
+                endpoint.models.discard(model)
+                endpoint.models.discard(f"{model}:latest")
+
+    def is_available(self, model=None):
+        """True if at least one endpoint serving model would accept a call right now"""
+        return any(e.serves(model) and e.breaker.is_available() for e in self.endpoints)
+
+    def state(self):
+        """Aggregate state: "closed" if all endpoints are closed, "open" if all are open, else "degraded" """
+        states = {e.breaker.state for e in self.endpoints}
+        if states == {CircuitBreaker.CLOSED}:
+            return CircuitBreaker.CLOSED
+        if states == {CircuitBreaker.OPEN}:
+            return CircuitBreaker.OPEN
+        return "degraded"
+
+    def status(self):
+        """Pool snapshot for /api/health"""
+        with self._lock:
+            endpoints = [e.status() for e in self.endpoints]
+        return {"state": self.state(), "endpoints": endpoints}
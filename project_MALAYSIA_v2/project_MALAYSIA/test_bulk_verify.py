@@ -0,0 +1,111 @@
+"""
+Tests for the bulk student verification endpoints
+Run from this folder: python -m pytest -q
+"""
+import json
+from collections import OrderedDict
+
+import pytest
+from fastapi.testclient import TestClient
+
+import auth_utils
+import main
+
+API_KEY = "test-integration-key"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(auth_utils, "INTEGRATION_API_KEYS", [API_KEY])
+    monkeypatch.setattr(main, "verified_sessions", {})
+    monkeypatch.setattr(main, "bulk_session_expiry", OrderedDict())
+    return TestClient(main.app)
+
+
+def roster_pair():
+    num_col, name_col = main.data_engine._find_identity_columns()
+    first = main.data_engine.df.iloc[0]
+    return str(first[num_col]), str(first[name_col])
+
+
+def test_requires_api_key(client):
+    response = client.post("/api/verify/bulk", json=[{"student_number": "1", "name": "x"}])
+    assert response.status_code == 401
+
+    response = client.post("/api/verify/bulk", json=[], headers={"X-API-Key": "wrong"})
+    assert response.status_code == 401
+
+
+def test_sessions_use_server_generated_ids(client):
+    if main.data_engine.roster is None:
+        pytest.skip("Chatbot_TestData.xlsx not available")
+    number, name = roster_pair()
+
+    response = client.post(
+        "/api/verify/bulk?create_sessions=true",
+        json=[{"student_number": number, "name": name.upper(), "session_id": "chosen"},
+              {"student_number": "no-such-student", "name": "nobody"}],
+        headers={"X-API-Key": API_KEY},
+    )
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["matched"] for r in rows] == [True, False]
+    assert rows[0]["session_id"] != "chosen"
+    assert list(main.verified_sessions) == [rows[0]["session_id"]]
+
+
+def test_csv_not_utf8_is_rejected(client):
+    response = client.post(
+        "/api/verify/bulk/csv",
+        files={"file": ("roster.csv", b"\xff\xfestudent_number,name\n", "text/csv")},
+        headers={"X-API-Key": API_KEY},
+    )
+    assert response.status_code == 400
+
+
+def test_oversized_upload_rejected_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BULK_BYTES", 100)
+    response = client.post(
+        "/api/verify/bulk",
+        json=[{"student_number": str(i), "name": "x"} for i in range(50)],
+        headers={"X-API-Key": API_KEY},
+    )
+    assert response.status_code == 413
+
+
+def test_duplicate_rows_share_one_session(client):
+    if main.data_engine.roster is None:
+        pytest.skip("Chatbot_TestData.xlsx not available")
+    number, name = roster_pair()
+
+    response = client.post(
+        "/api/verify/bulk?create_sessions=true",
+        json=[{"student_number": number, "name": name}, {"student_number": f" {number}", "name": name.lower()}],
+        headers={"X-API-Key": API_KEY},
+    )
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows[0]["session_id"] == rows[1]["session_id"]
+    assert len(main.verified_sessions) == 1
+
+
+def test_bulk_sessions_expire_and_are_capped(client, monkeypatch):
+    if main.data_engine.roster is None:
+        pytest.skip("Chatbot_TestData.xlsx not available")
+    number, name = roster_pair()
+    monkeypatch.setattr(main, "MAX_BULK_SESSIONS", 2)
+
+    def create_session():
+        response = client.post(
+            "/api/verify/bulk?create_sessions=true",
+            json=[{"student_number": number, "name": name}],
+            headers={"X-API-Key": API_KEY},
+        )
+        return json.loads(response.text.splitlines()[0])["session_id"]
+
+    first, second, third = create_session(), create_session(), create_session()
+    assert list(main.verified_sessions) == [second, third]  # Oldest evicted at the cap
+
+    main.bulk_session_expiry[second] = 0  # Expired
+    main.prune_bulk_sessions()
+    assert list(main.verified_sessions) == [third]
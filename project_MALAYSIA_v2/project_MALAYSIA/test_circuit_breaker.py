@@ -0,0 +1,130 @@
+"""
+Tests for CircuitBreaker state transitions
+Run from this folder: python -m pytest -q
+"""
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", fake)
+    return fake
+
+
+def make_breaker():
+    return CircuitBreaker(name="test", failure_threshold=3, latency_threshold=1.0, recovery_timeout=30.0)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert not breaker.is_available()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_success(5.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    # A per-call threshold overrides the default
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_success(5.0, latency_threshold=10.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_a_single_trial(clock):
+    breaker = make_breaker()
+    breaker.trip("down")
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.is_available()
+    assert breaker.allow_request()
+    # Trial in flight: every other call is refused
+    assert not breaker.allow_request()
+    assert not breaker.is_available()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens(clock):
+    breaker = make_breaker()
+    breaker.trip("down")
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure("still down")
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_released_trial_can_be_retried(clock):
+    breaker = make_breaker()
+    breaker.trip("down")
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.release_trial()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_probe_failures_count_towards_threshold(clock):
+    breaker = make_breaker()
+    breaker._on_probe(False)
+    breaker._on_probe(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker._on_probe(False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_probe_skips_recovery_timeout_when_unreachable(clock):
+    breaker = make_breaker()
+    breaker.trip("startup connection check failed")
+    breaker._on_probe(True)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_probe_does_not_shortcut_latency_trip(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_success(5.0)
+    # /api/tags answers fast while generation is still overloaded
+    breaker._on_probe(True)
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_slow_trial_keeps_latency_cause(clock):
+    breaker = make_breaker()
+    breaker.trip("down")
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_success(5.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker._on_probe(True)
+    assert breaker.state == CircuitBreaker.OPEN
@@ -0,0 +1,96 @@
+"""
+Tests for ContextBudgeter
+Run from this folder: python -m pytest -q
+"""
+from context_budget import ContextBudgeter, estimate_tokens
+
+TEMPLATE_ANSWER = """📋 Student Information
+━━━━━━━━━━━━━━━━━━━━━━━━
+Student Number: 1001
+Name: Vicky Yiran
+Nationality: China
+━━━━━━━━━━━━━━━━━━━━━━━━"""
+
+
+def test_compress_example_keeps_one_line_per_field():
+    budgeter = ContextBudgeter()
+    summary = budgeter.compress_example(TEMPLATE_ANSWER)
+    assert summary.splitlines() == [
+        "Student Information",
+        "Student Number: 1001",
+        "Name: Vicky Yiran",
+        "Nationality: China",
+    ]
+
+
+def test_compress_example_truncates_long_answers():
+    budgeter = ContextBudgeter(max_example_tokens=20)
+    summary = budgeter.compress_example("\n".join(f"Field {i}: value {i}" for i in range(50)))
+    assert summary.endswith("…")
+    assert estimate_tokens(summary) <= 20
+
+
+def test_compress_example_is_cached():
+    budgeter = ContextBudgeter(cache_size=2)
+    first = budgeter.compress_example(TEMPLATE_ANSWER)
+    assert budgeter.compress_example(TEMPLATE_ANSWER) is first
+    budgeter.compress_example("a")
+    budgeter.compress_example("b")
+    assert TEMPLATE_ANSWER not in budgeter._cache  # Least recently used entry evicted
+    assert len(budgeter._cache) == 2
+
+
+def test_dedupe_drops_near_duplicates_and_keeps_order():
+    budgeter = ContextBudgeter(similarity_threshold=0.9)
+    examples = [
+        "Total Students: 120\nFemale: 60\nMale: 60",
+        "Campus opens at 8am",
+        "Total Students: 120\nFemale: 60\nMale: 60.",
+    ]
+    assert budgeter.dedupe(examples) == examples[:2]
+
+
+def test_fit_prefers_good_examples_then_recent_ones():
+    budgeter = ContextBudgeter(max_tokens=25)
+    good = [c * 40 for c in "xyz"]  # ~11 tokens each
+    bad = ["b" * 40]
+    feedback, history, report = budgeter.fit("", {"good": good, "bad": bad})
+    # Only two good examples fit; the most recent ones are kept, in original order
+    assert feedback["good"] == good[1:]
+    assert feedback["bad"] == []
+    assert report["dropped_examples"] == 2
+    assert report["total_tokens"] <= 25
+
+
+def test_fit_trims_oldest_history_without_orphaned_reply():
+    budgeter = ContextBudgeter(max_tokens=30)
+    history = [
+        {"role": "user", "content": "u" * 40},
+        {"role": "assistant", "content": "a" * 40},
+        {"role": "user", "content": "u" * 40},
+        {"role": "assistant", "content": "a" * 40},
+    ]
+    _, fitted, report = budgeter.fit("", {}, history)
+    assert fitted == history[2:]
+    assert report["dropped_history"] == 2
+
+
+def test_fit_counts_fixed_and_data_tokens():
+    budgeter = ContextBudgeter(max_tokens=40)
+    example = "x" * 40  # ~11 tokens
+    feedback, _, report = budgeter.fit("d" * 40, {"good": [example]}, fixed_tokens=20)
+    assert feedback["good"] == []  # 20 fixed + 11 data leaves no room for the example
+    assert report["fixed_tokens"] == 20
+    assert report["total_tokens"] == 20 + estimate_tokens("d" * 40)
+
+
+def test_fit_warns_when_data_exceeds_limit(capsys):
+    budgeter = ContextBudgeter(max_tokens=10)
+    data = "d" * 400
+    feedback, history, report = budgeter.fit(
+        data, {"good": ["tiny"]}, [{"role": "user", "content": "hi"}], fixed_tokens=5
+    )
+    assert "over budget" in capsys.readouterr().out
+    assert feedback == {"good": [], "bad": []}
+    assert history == []
+    assert report["data_tokens"] == estimate_tokens(data)  # Data is never cut
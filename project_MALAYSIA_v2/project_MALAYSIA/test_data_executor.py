@@ -0,0 +1,57 @@
+"""
+Tests for DataExecutor scheduling
+Run from this folder: python -m pytest -q
+"""
+import asyncio
+import threading
+import time
+
+from data_executor import DataExecutor
+
+
+class FakeEngine:
+    def __init__(self):
+        self.release_reader = threading.Event()
+
+    def get_relevant_feedback(self, query):
+        if query == "first":
+            self.release_reader.wait(5)  # Holds the shared lock until released
+        return {"good": [], "bad": []}
+
+    def save_feedback(self, *args):
+        return True
+
+    def get_summary_stats(self):
+        return {"total_students": 1}
+
+
+def test_roster_work_not_blocked_by_feedback_lock_waiters():
+    engine = FakeEngine()
+    executor = DataExecutor(engine, max_workers=4)
+
+    async def scenario():
+        first = asyncio.create_task(executor.read("get_relevant_feedback", "first"))
+        await asyncio.sleep(0.05)
+        # A writer queues behind the running reader, and new readers queue behind the writer
+        writer = asyncio.create_task(executor.write("save_feedback", "q", "a", "good"))
+        await asyncio.sleep(0.05)
+        readers = [asyncio.create_task(executor.read("get_relevant_feedback", "next")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        start = time.monotonic()
+        stats = await executor.run("get_summary_stats")
+        elapsed = time.monotonic() - start
+
+        engine.release_reader.set()
+        await asyncio.gather(first, writer, *readers)
+        return stats, elapsed
+
+    try:
+        stats, elapsed = asyncio.run(scenario())
+    finally:
+        engine.release_reader.set()
+        executor.shutdown()
+
+    assert stats == {"total_students": 1}
+    assert elapsed < 0.2
+    assert executor.metrics()["pending"] == 0
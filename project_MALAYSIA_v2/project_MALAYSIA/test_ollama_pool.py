@@ -0,0 +1,75 @@
+"""
+Tests for EndpointPool routing
+Run from this folder: python -m pytest -q
+"""
+from ollama_pool import EndpointPool
+
+
+def make_pool(models_a=None, models_b=None):
+    pool = EndpointPool(["http://a", "http://b"])
+    a, b = pool.endpoints
+    a.models, b.models = models_a, models_b
+    return pool, a, b
+
+
+def test_sequential_requests_alternate_endpoints():
+    pool, a, b = make_pool()
+    picked = []
+    for _ in range(6):
+        endpoint = pool.acquire()
+        picked.append(endpoint.url)
+        pool.release(endpoint)
+    assert picked == ["http://a", "http://b"] * 3
+
+
+def test_least_outstanding_wins_over_rotation():
+    pool, a, b = make_pool()
+    held = pool.acquire()
+    assert held is a
+    # a is busy, so b is picked twice in a row
+    assert pool.acquire() is b
+    pool.release(b)
+    assert pool.acquire() is b
+
+
+def test_routes_only_to_endpoints_with_the_model():
+    pool, a, b = make_pool({"llama3.2:1b"}, {"llama3.1:latest", "llama3.2:1b"})
+    for _ in range(4):
+        endpoint = pool.acquire("llama3.1")  # Untagged name matches ":latest"
+        assert endpoint is b
+        pool.release(endpoint)
+    assert pool.acquire("mistral") is None
+    assert not pool.serves("mistral")
+    assert pool.serves("llama3.2:1b")
+
+
+def test_unknown_model_list_is_routable():
+    pool, a, b = make_pool(None, {"llama3.2:1b"})
+    assert a.serves("llama3.1:latest")
+    assert pool.acquire("llama3.1:latest") is a
+
+
+def test_mark_missing_stops_routing():
+    pool, a, b = make_pool({"llama3.1:latest"}, {"llama3.1:latest"})
+    pool.mark_missing(a, "llama3.1")
+    assert not a.serves("llama3.1")
+    assert pool.acquire("llama3.1") is b
+
+
+def test_open_breaker_is_skipped():
+    pool, a, b = make_pool()
+    a.breaker.trip("down")
+    assert pool.acquire() is b
+    assert pool.is_available()
+    assert pool.state() == "degraded"
+    b.breaker.trip("down")
+    assert pool.acquire() is None
+    assert not pool.is_available()
+    assert pool.state() == "open"
+
+
+def test_is_available_per_model():
+    pool, a, b = make_pool({"llama3.1:latest"}, {"llama3.2:1b"})
+    a.breaker.trip("down")
+    assert not pool.is_available("llama3.1:latest")
+    assert pool.is_available("llama3.2:1b")
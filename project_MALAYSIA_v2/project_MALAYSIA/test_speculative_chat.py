@@ -0,0 +1,122 @@
+"""
+Regression tests for speculative /api/chat
+Run from this folder: python -m pytest -q
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from ai_engine import AIEngine, StreamCancel
+
+
+@pytest.fixture
+def speculations(monkeypatch):
+    """Every SpeculativeAnswer started during the test"""
+    started = []
+
+    class RecordingSpeculativeAnswer(main.SpeculativeAnswer):
+        def __init__(self, *args):
+            super().__init__(*args)
+            started.append(self)
+
+    monkeypatch.setattr(main, "SpeculativeAnswer", RecordingSpeculativeAnswer)
+    return started
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "SPECULATIVE_MODE", True)
+    monkeypatch.setattr(main.ai_engine, "is_available", lambda: True)
+    monkeypatch.setattr(main.ai_engine, "chat_history", [])
+    return TestClient(main.app)
+
+
+def slow_feedback(query):
+    time.sleep(0.3)
+    return {"good": [], "bad": []}
+
+
+def test_personal_data_with_slow_feedback_returns_login_hint(client, monkeypatch, speculations):
+    # Speculation is cancelled while feedback retrieval is still running
+    monkeypatch.setattr(main.ai_engine, "classify_intent", lambda msg: {"intent": "PERSONAL_DATA", "search_term": None})
+    monkeypatch.setattr(main.ai_engine, "speculative_response", lambda *args: "speculative answer")
+    monkeypatch.setattr(main.data_engine, "get_relevant_feedback", slow_feedback)
+
+    response = client.post("/api/chat", json={"message": "Who is Vicky Yiran?"})
+
+    assert response.status_code == 200
+    assert response.json()["type"] == "login_hint"
+    assert "speculative answer" not in response.text
+    assert len(speculations) == 1
+    assert speculations[0].cancel_handle.is_set()
+    assert main.ai_engine.chat_history == []
+
+
+def test_general_returns_speculative_answer(client, monkeypatch, speculations):
+    monkeypatch.setattr(main.ai_engine, "classify_intent", lambda msg: {"intent": "GENERAL", "search_term": None})
+    monkeypatch.setattr(main.ai_engine, "speculative_response", lambda *args: "speculative answer")
+    monkeypatch.setattr(main.data_engine, "get_relevant_feedback", slow_feedback)
+
+    response = client.post("/api/chat", json={"message": "Hello!"})
+
+    assert response.status_code == 200
+    assert response.json()["response"] == "speculative answer"
+    assert not speculations[0].cancel_handle.is_set()
+    assert [m["content"] for m in main.ai_engine.chat_history] == ["Hello!", "speculative answer"]
+
+
+class PrefillingOllama(BaseHTTPRequestHandler):
+    """Lists the model, then holds /api/chat without sending a byte (a long prefill)"""
+    protocol_version = "HTTP/1.1"
+    disconnected = threading.Event()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps({"models": [{"name": "llama3.1:latest"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.connection.settimeout(5)
+        if self.rfile.read(1) == b"":  # Returns once the client closes the connection
+            PrefillingOllama.disconnected.set()
+
+
+def test_cancel_aborts_stream_before_first_chunk():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PrefillingOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    engine = AIEngine("llama3.1:latest", endpoints=[f"http://127.0.0.1:{server.server_port}"])
+    engine.pool.endpoints[0].breaker.stop_probes()
+    payload = {"model": "llama3.1:latest", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+    cancel = StreamCancel()
+    result = {}
+
+    def stream():
+        result["value"] = engine._stream_chat(payload, timeout=10, cancel=cancel)
+
+    worker = threading.Thread(target=stream)
+    try:
+        worker.start()
+        time.sleep(0.2)
+        assert engine.pool.endpoints[0].outstanding == 1
+        start = time.monotonic()
+        cancel.set()
+        worker.join(2)
+        assert not worker.is_alive()
+        assert time.monotonic() - start < 1
+        assert result["value"] is None
+        assert engine.pool.endpoints[0].outstanding == 0
+        assert engine.pool.endpoints[0].breaker.state == "closed"
+        assert PrefillingOllama.disconnected.wait(2)
+    finally:
+        server.shutdown()